@@ -0,0 +1,135 @@
+"""ASGI sibling of the Flask app for the read-heavy catalogue and cart views.
+
+Serves GET /books, GET /books/<id> and GET /cart on an asyncio engine, so one process
+can keep many slow clients waiting on the database at once. It shares the models and
+config with the Flask app; every write still goes through the Flask app.
+
+    pip install -r requirements-asgi.txt
+    hypercorn asgi:app
+"""
+from quart import Quart, jsonify, request
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+import jwt
+import os
+from books import decode_cursor, encode_cursor, load_only_fields, page_size, parse_fields
+from cart import cart_summary
+from config import async_engine_options, sqlite_pragma_listener
+from models import Books, Cart, RevokedToken, user
+
+app = Quart(__name__)
+app.config.from_object(os.environ.get('BOOKSTORE_CONFIG', 'config.Config'))
+
+
+def create_engine(url):
+    engine = create_async_engine(url, **async_engine_options(url))
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine.sync_engine, 'connect', sqlite_pragma_listener(app.config['SQLITE_PRAGMAS']))
+    return engine
+
+primary = create_engine(app.config['ASYNC_DATABASE_URL'])
+# The catalogue can lag a little, so it reads from the replica when there is one. Carts
+# are read from the primary: a client usually views its cart right after changing it.
+replica = create_engine(app.config['ASYNC_DATABASE_REPLICA_URL']) if app.config['ASYNC_DATABASE_REPLICA_URL'] else primary
+Session = async_sessionmaker(primary, expire_on_commit=False)
+ReplicaSession = async_sessionmaker(replica, expire_on_commit=False)
+
+@app.after_serving
+async def dispose_engines():
+    await primary.dispose()
+    await replica.dispose()
+
+async def request_user_id(session):
+    # Checks the Flask app's access tokens with PyJWT, so both apps accept the same tokens
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    try:
+        claims = jwt.decode(
+            header[len('Bearer '):],
+            app.config['JWT_SECRET_KEY'],
+            algorithms=[app.config.get('JWT_ALGORITHM', 'HS256')]
+        )
+    except jwt.PyJWTError:
+        return None
+    if claims.get('type') != 'access':
+        return None
+    # No Bloom filter here: the indexed lookup shares the cart query's connection
+    if claims.get('jti') and await session.scalar(select(RevokedToken.id).where(RevokedToken.jti == claims['jti'])):
+        return None
+    if 'uid' in claims:
+        return claims['uid']
+    # Tokens issued before the uid claim existed only carry the email
+    email = (claims.get('sub') or {}).get('email')
+    return await session.scalar(select(user.id).where(user.email == email)) if email else None
+
+@app.route('/books', methods=['GET'])
+async def list_books():
+    fields = parse_fields(request.args.get('fields'), Books.LIST_FIELDS)
+    if fields is None:
+        return jsonify({"msg": "Unknown field requested"}), 400
+
+    async with ReplicaSession() as session:
+        query = select(Books).options(load_only_fields(fields)).order_by(Books.id)
+
+        # Offset mode (?page=N&per_page=M), answered in the same shape as Flask-SQLAlchemy's paginate()
+        if 'page' in request.args:
+            page = max(1, request.args.get('page', 1, type=int))
+            per_page = page_size(request.args.get('per_page', type=int), app.config)
+            total = await session.scalar(select(func.count()).select_from(Books))
+            books = (await session.scalars(query.offset((page - 1) * per_page).limit(per_page))).all()
+            pages = -(-total // per_page)
+            return jsonify({
+                'books': [book.todict(fields) for book in books],
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': pages,
+                'next_page': page + 1 if page < pages else None
+            }), 200
+
+        # Keyset mode (?after=<cursor>&limit=N)
+        limit = page_size(request.args.get('limit', type=int), app.config)
+        after = request.args.get('after')
+        if after:
+            last_id = decode_cursor(after)
+            if last_id is None:
+                return jsonify({"msg": "Invalid cursor"}), 400
+            query = query.where(Books.id > last_id)
+        books = (await session.scalars(query.limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(books[-1].id)
+    return jsonify({
+        'books': [book.todict(fields) for book in books],
+        'next_cursor': next_cursor
+    }), 200
+
+@app.route('/books/<int:book_id>', methods=['GET'])
+async def get_book(book_id):
+    fields = parse_fields(request.args.get('fields'), Books.FIELDS)
+    if fields is None:
+        return jsonify({"msg": "Unknown field requested"}), 400
+    async with ReplicaSession() as session:
+        book = await session.get(Books, book_id, options=[load_only_fields(fields)])
+    if not book:
+        return jsonify({"msg": "Book not found"}), 404
+    return jsonify(book.todict(fields)), 200
+
+@app.route('/cart', methods=['GET'])
+async def view_cart():
+    async with Session() as session:
+        user_id = await request_user_id(session)
+        if user_id is None:
+            return jsonify({"msg": "Missing or invalid access token"}), 401
+        cart_items = (await session.scalars(
+            select(Cart)
+            .options(joinedload(Cart.book).load_only(Books.title, Books.price, Books.cover_image))
+            .where(Cart.user_id == user_id)
+            .order_by(Cart.id)
+        )).all()
+
+    return jsonify(cart_summary(cart_items)), 200
@@ -0,0 +1,49 @@
+from flask import jsonify
+from flask_jwt_extended import get_current_user, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from extensions import blocklist, jwt, user_cache
+from models import user
+
+
+@jwt.user_lookup_loader
+def load_current_user(_jwt_header, jwt_data):
+    # Runs for every protected request, so the common case must not query the database
+    email = jwt_data['sub'].get('email')
+    if 'uid' in jwt_data:
+        return {'id': jwt_data['uid'], 'email': email}
+    if email is None:
+        return None
+    user_id = user_cache.get(email)
+    if user_id is None:
+        user_record = user.query.filter_by(email=email).first()
+        if not user_record:
+            return None
+        user_id = user_record.id
+        user_cache.set(email, user_id)
+    return {'id': user_id, 'email': email}
+
+@jwt.user_lookup_error_loader
+def user_lookup_error(_jwt_header, _jwt_data):
+    return jsonify({"msg": "User not found"}), 404
+
+@jwt.token_in_blocklist_loader
+def token_revoked(_jwt_header, jwt_data):
+    # Runs for every protected request; tokens the Bloom filter hasn't seen skip the database
+    jti = jwt_data.get('jti')
+    return jti is not None and blocklist.is_revoked(jti)
+
+def request_user_id():
+    # The caller's user id when the request carries a valid token, on public views too
+    try:
+        # Raises RuntimeError until a JWT check has run on this request; None after an
+        # optional check that found no token
+        user_record = get_current_user()
+    except RuntimeError:
+        try:
+            verify_jwt_in_request(optional=True)
+        except (JWTExtendedException, PyJWTError):
+            # A bad token on a public view just means an anonymous caller
+            return None
+        user_record = get_current_user()
+    return user_record['id'] if user_record else None
@@ -0,0 +1,61 @@
+"""Measures password checks per second at each hashing cost.
+
+    python benchmarks/passwords.py [--seconds 3] [--threads 1,2,4] [method ...]
+
+Each method is timed on 1 thread to give logins/sec per core, then on more threads
+to show how far PASSWORD_HASH_WORKERS scales on this machine. Methods are
+werkzeug.security strings; by default a range of PBKDF2 and scrypt costs is run.
+"""
+import argparse
+import os
+import threading
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METHODS = [
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:600000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'scrypt:65536:8:1'
+]
+
+
+def checks_per_second(stored, threads, seconds):
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def work(index):
+        while time.perf_counter() < deadline:
+            check_password_hash(stored, 'correct horse battery staple')
+            counts[index] += 1
+
+    workers = [threading.Thread(target=work, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('methods', nargs='*', default=METHODS)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--threads', default='1,2,4')
+    args = parser.parse_args()
+    thread_counts = [int(count) for count in args.threads.split(',')]
+
+    print("%d CPUs" % os.cpu_count())
+    # Columns after ms/login are checks per second with that many threads
+    print("%-24s %10s" % ('method', 'ms/login') + ''.join('%10s' % ('%d thr' % count) for count in thread_counts))
+    for method in args.methods:
+        stored = generate_password_hash('correct horse battery staple', method)
+        rates = [checks_per_second(stored, count, args.seconds) for count in thread_counts]
+        print("%-24s %10.1f" % (method, 1000 / rates[0]) + ''.join('%10.1f' % rate for rate in rates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Measures cold start and preload-then-fork cost of the bookstore app.
+
+    python benchmarks/startup.py [--runs 5] [--top 15] [--workers 4]
+
+Cold start runs ``python -X importtime`` in a fresh interpreter for every run, so
+nothing is shared between runs, and reports the import total, the slowest modules
+and the time to build an app with create_app(). On POSIX it then preloads one app,
+forks workers the way a preloading server does, and reports how much memory each
+worker dirties answering its first request (lower means more pages stay shared).
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+COLD_START = """
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+print('%.1f %.1f' % ((imported - started) * 1000, (time.perf_counter() - imported) * 1000))
+"""
+
+
+def cold_start():
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', COLD_START],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if match:
+            # Cumulative time of top-level imports only, so nested imports aren't counted twice
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)), len(match.group(3)) == 1)
+    import_ms, create_ms = (float(value) for value in result.stdout.split())
+    return modules, import_ms, create_ms
+
+
+def private_dirty_kb():
+    # Linux only: memory this process has written to since it was forked
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            if line.startswith('Private_Dirty:'):
+                return int(line.split()[1])
+    return None
+
+
+def fork_workers(workers):
+    import gc
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from app import create_app
+    app = create_app()
+    # Move everything allocated so far out of the collector's reach, so the first
+    # collection in a worker doesn't write to (and un-share) every preloaded object
+    gc.freeze()
+
+    results = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            before = private_dirty_kb()
+            app.test_client().get('/')
+            after = private_dirty_kb()
+            os.write(write_fd, ('%d %d' % (before, after)).encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            results.append(tuple(int(value) for value in pipe.read().split()))
+        os.waitpid(pid, 0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    totals, imports, creates, per_module = [], [], [], {}
+    for _ in range(args.runs):
+        modules, import_ms, create_ms = cold_start()
+        totals.append(sum(cumulative for _, cumulative, top in modules.values() if top) / 1000)
+        imports.append(import_ms)
+        creates.append(create_ms)
+        for name, (_, cumulative, _) in modules.items():
+            per_module.setdefault(name, []).append(cumulative / 1000)
+
+    print("Cold start over %d runs (median ms)" % args.runs)
+    print("  -X importtime total   %8.1f" % statistics.median(totals))
+    print("  import app            %8.1f" % statistics.median(imports))
+    print("  create_app()          %8.1f" % statistics.median(creates))
+    print("Slowest imports (median cumulative ms)")
+    slowest = sorted(per_module.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, samples in slowest[:args.top]:
+        print("  %-40s %8.1f" % (name, statistics.median(samples)))
+
+    if not hasattr(os, 'fork') or not os.path.exists('/proc/self/smaps_rollup'):
+        print("Preload-then-fork needs fork() and /proc; skipped")
+        return
+    print("Preload-then-fork, %d workers (KiB private dirty per worker)" % args.workers)
+    for index, (before, after) in enumerate(fork_workers(args.workers)):
+        print("  worker %d: %d after fork, %d after first request" % (index, before, after))
+
+
+if __name__ == '__main__':
+    main()
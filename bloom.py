@@ -0,0 +1,27 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """Set membership with no false negatives: ``in`` may wrongly say yes about
+    ``false_positive_rate`` of the time, but never wrongly says no."""
+
+    def __init__(self, capacity, false_positive_rate=0.001):
+        self.bits = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + index * second) % self.bits for index in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
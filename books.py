@@ -0,0 +1,438 @@
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import func, insert, literal_column, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+from flask_jwt_extended import jwt_required
+import base64
+import binascii
+import csv
+import io
+import json
+import zlib
+from caching import bump_catalogue_version, cache_response, cached_catalogue_view, cached_response, conditional_response, invalidate_books, is_fresh, not_modified
+from extensions import db
+from idempotency import idempotent
+from models import Books, books_fts
+from replica import replica_read
+from throttling import rate_limited
+
+bp = Blueprint('books', __name__)
+
+@bp.route('/books', methods=['POST'])
+@jwt_required()
+@idempotent
+def add_book():
+    data = request.get_json()
+    
+    # Scenario where no details are provided
+    if not data:
+        return jsonify({"msg": "No data provided"}), 400
+    
+    title = data.get('title')
+    author = data.get('author')
+    description = data.get('description')
+    price = data.get('price')
+    category = data.get('category')
+    cover_image = data.get('cover_image')
+    stock = data.get('stock', 0)
+    
+    # Scenario where any details are missing
+    if title is None or author is None or price is None:
+        return jsonify({"msg": "Title, author, or price is missing"}), 400
+    if not isinstance(stock, int) or stock < 0:
+        return jsonify({"msg": "Stock must be a non-negative integer"}), 400
+    
+    new_book = Books(
+        title=title,
+        author=author,
+        description=description,
+        price=price,
+        category=category,
+        cover_image=cover_image,
+        stock=stock
+    )
+    
+    db.session.add(new_book)
+    db.session.commit()
+    bump_catalogue_version()
+    return jsonify(new_book.todict()), 201
+
+def parse_fields(raw, default):
+    # Sparse fieldsets: ?fields=title,price. Returns None when an unknown field is asked for.
+    # Takes the raw query value so the ASGI app in asgi.py can share it.
+    if not raw:
+        return default
+    requested = {field.strip() for field in raw.split(',') if field.strip()}
+    if not requested <= set(Books.FIELDS):
+        return None
+    requested.add('id')
+    return tuple(field for field in Books.FIELDS if field in requested)
+
+def load_only_fields(fields):
+    return load_only(*[getattr(Books, field) for field in fields])
+
+@bp.route('/books/<int:book_id>', methods=['GET'])
+@rate_limited(cost=1)
+@replica_read
+def get_book(book_id):
+    fields = parse_fields(request.args.get('fields'), Books.FIELDS)
+    if fields is None:
+        return jsonify({"msg": "Unknown field requested"}), 400
+
+    # Only the full representation is cached; sparse fieldsets always go to the database.
+    # Entries are "<etag>\n<last modified>\n<body>" so hits can be validated without a query.
+    cacheable = fields == Books.FIELDS
+    if cacheable:
+        entry = cached_response('book:%d' % book_id)
+        if entry is not None:
+            etag, modified, body = entry.split(b'\n', 2)
+            modified = datetime.fromisoformat(modified.decode())
+            return conditional_response(body, etag.decode(), book_last_modified(modified))
+
+    # A conditional request can be answered from the row's timestamps alone
+    if request.if_none_match or request.if_modified_since:
+        stamps = db.session.query(Books.created_at, Books.updated_at).filter(Books.id == book_id).first()
+        if stamps:
+            modified = stamps.updated_at or stamps.created_at
+            etag = book_etag(book_id, modified, fields)
+            if is_fresh(etag, book_last_modified(modified)):
+                return not_modified(etag, book_last_modified(modified))
+
+    book = Books.query.options(load_only_fields(fields + ('created_at', 'updated_at'))).get(book_id)
+    if not book:
+        return jsonify({"msg": "Book not found"}), 404
+
+    modified = book.updated_at or book.created_at
+    etag = book_etag(book_id, modified, fields)
+    body = jsonify(book.todict(fields)).get_data()
+    if cacheable:
+        cache_response('book:%d' % book_id, b'%s\n%s\n%s' % (etag.encode(), modified.isoformat().encode(), body))
+    return conditional_response(body, etag, book_last_modified(modified))
+
+def book_etag(book_id, modified, fields):
+    etag = '%d-%s' % (book_id, modified.strftime('%Y%m%d%H%M%S%f'))
+    if fields != Books.FIELDS:
+        etag += '-%x' % zlib.crc32(','.join(fields).encode())
+    return etag
+
+def book_last_modified(modified):
+    # Timestamps are stored as naive local time; HTTP dates are UTC
+    return modified.astimezone(timezone.utc)
+
+def encode_cursor(book_id):
+    # The cursor is opaque to clients: they only ever echo back what we gave them
+    return base64.urlsafe_b64encode(str(book_id).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+def page_size(size, config):
+    if size is None:
+        size = config['BOOKS_PAGE_SIZE']
+    return max(1, min(size, config['BOOKS_MAX_PAGE_SIZE']))
+
+def paginated_books(query, serialize):
+    pagination = query.paginate(
+        page=request.args.get('page', 1, type=int),
+        per_page=page_size(request.args.get('per_page', type=int), current_app.config),
+        max_per_page=current_app.config['BOOKS_MAX_PAGE_SIZE'],
+        error_out=False
+    )
+    return jsonify({
+        'books': [serialize(item) for item in pagination.items],
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'next_page': pagination.next_num
+    }), 200
+
+@bp.route('/books', methods=['GET'])
+@rate_limited(cost=5)
+@replica_read
+@cached_catalogue_view
+def list_books():
+    fields = parse_fields(request.args.get('fields'), Books.LIST_FIELDS)
+    if fields is None:
+        return jsonify({"msg": "Unknown field requested"}), 400
+
+    # Offset mode (?page=N&per_page=M) for admin UIs that need page numbers and totals
+    if 'page' in request.args:
+        query = Books.query.options(load_only_fields(fields)).order_by(Books.id)
+        return paginated_books(query, lambda book: book.todict(fields))
+
+    # Keyset mode (?after=<cursor>&limit=N): WHERE id > :cursor ORDER BY id LIMIT :n
+    limit = page_size(request.args.get('limit', type=int), current_app.config)
+    query = Books.query.options(load_only_fields(fields)).order_by(Books.id)
+    after = request.args.get('after')
+    if after:
+        last_id = decode_cursor(after)
+        if last_id is None:
+            return jsonify({"msg": "Invalid cursor"}), 400
+        query = query.filter(Books.id > last_id)
+
+    # Fetch one extra row to know whether another page exists
+    books = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(books[-1].id)
+
+    return jsonify({
+        'books': [book.todict(fields) for book in books],
+        'next_cursor': next_cursor
+    }), 200
+
+SEARCH_SORTS = {
+    'id': Books.id,
+    'price': Books.price,
+    '-price': Books.price.desc(),
+    'title': Books.title,
+    '-title': Books.title.desc(),
+    'created_at': Books.created_at,
+    '-created_at': Books.created_at.desc()
+}
+
+@bp.route('/books/search', methods=['GET'])
+@rate_limited(cost=10)
+@replica_read
+@cached_catalogue_view
+def search_books():
+    fields = parse_fields(request.args.get('fields'), Books.LIST_FIELDS)
+    if fields is None:
+        return jsonify({"msg": "Unknown field requested"}), 400
+
+    sort = request.args.get('sort', 'id')
+    if sort not in SEARCH_SORTS:
+        return jsonify({"msg": "Sort must be one of " + ", ".join(SEARCH_SORTS)}), 400
+
+    # Keyword search (?q=...) goes through the FTS5 index and is ranked by BM25
+    match = fts_match_expression(request.args.get('q', ''))
+    if match and db.session.get_bind().dialect.name != 'sqlite':
+        return jsonify({"msg": "Keyword search needs the SQLite FTS5 index"}), 501
+    if match:
+        fts = literal_column('books_fts')
+        snippet = func.snippet(fts, -1, '<mark>', '</mark>', '...', 16)
+        query = db.session.query(Books, snippet).join(books_fts, books_fts.c.rowid == Books.id)
+        query = query.filter(fts.match(match))
+        serialize = lambda hit: dict(hit[0].todict(fields), snippet=hit[1])
+    else:
+        query = Books.query
+        serialize = lambda book: book.todict(fields)
+    query = query.options(load_only_fields(fields))
+
+    # category, author and price are indexed, so these filters are index lookups
+    category = request.args.get('category')
+    if category:
+        query = query.filter(Books.category == category)
+    author = request.args.get('author')
+    if author:
+        query = query.filter(Books.author == author)
+    title = request.args.get('title')
+    if title:
+        query = query.filter(Books.title.startswith(title, autoescape=True))
+
+    try:
+        min_price = request.args.get('min_price', type=Decimal)
+        max_price = request.args.get('max_price', type=Decimal)
+    except InvalidOperation:
+        return jsonify({"msg": "Price range must be numeric"}), 400
+    if min_price is not None:
+        query = query.filter(Books.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Books.price <= max_price)
+
+    # Matches are ordered by relevance unless the client asks for a specific sort.
+    # bm25() weights a hit in the title above the author, and both above the description.
+    if match and 'sort' not in request.args:
+        query = query.order_by(func.bm25(literal_column('books_fts'), 10.0, 5.0, 1.0))
+    # id breaks ties so pages stay stable between requests
+    return paginated_books(query.order_by(SEARCH_SORTS[sort], Books.id), serialize)
+
+def fts_match_expression(q):
+    # Quote every term so user input is never parsed as FTS5 query syntax
+    terms = q.split()
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+@bp.route('/books/export', methods=['GET'])
+@rate_limited(cost=50)
+@replica_read
+def export_books():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        return jsonify({"msg": "Format must be ndjson or json"}), 400
+    fields = parse_fields(request.args.get('fields'), Books.FIELDS)
+    if fields is None:
+        return jsonify({"msg": "Unknown field requested"}), 400
+
+    # Server-side cursor: rows are fetched batch by batch and never held as one list
+    stmt = select(Books).options(load_only_fields(fields)).order_by(Books.id).execution_options(
+        yield_per=current_app.config['BOOKS_EXPORT_BATCH_SIZE']
+    )
+
+    def generate():
+        books = db.session.execute(stmt).scalars()
+        if export_format == 'ndjson':
+            for book in books:
+                yield json.dumps(book.todict(fields)) + '\n'
+        else:
+            yield '['
+            separator = ''
+            for book in books:
+                yield separator + json.dumps(book.todict(fields))
+                separator = ','
+            yield ']'
+
+    mimetype = 'application/x-ndjson' if export_format == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+@bp.route('/books/bulk', methods=['POST'])
+@jwt_required()
+@rate_limited(cost=50)
+def bulk_add_books():
+    # JSON arrays are parsed whole; NDJSON and CSV bodies are streamed line by line
+    if request.mimetype == 'application/json':
+        rows = request.get_json()
+        if not isinstance(rows, list):
+            return jsonify({"msg": "A list of books is required"}), 400
+    elif request.mimetype in ('application/x-ndjson', 'text/csv'):
+        body = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        rows = read_book_rows(body, 'csv' if request.mimetype == 'text/csv' else 'ndjson')
+    else:
+        return jsonify({"msg": "Body must be JSON, NDJSON or CSV"}), 415
+    
+    batch_size = request.args.get('batch_size', current_app.config['BOOKS_IMPORT_BATCH_SIZE'], type=int)
+    report = import_books(rows, max(1, batch_size))
+    return jsonify(report), 200
+
+def read_book_rows(file, import_format):
+    if import_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+def validate_book_row(row):
+    # Returns (values, error); blank optional CSV cells are stored as NULL
+    if not isinstance(row, dict):
+        return None, 'Row must be a JSON object'
+    values = {field: row.get(field) or None for field in ('title', 'author', 'description', 'category', 'cover_image')}
+    if values['title'] is None or values['author'] is None or row.get('price') in (None, ''):
+        return None, 'Title, author, or price is missing'
+    try:
+        values['price'] = Decimal(str(row['price']))
+    except InvalidOperation:
+        return None, 'Price must be numeric'
+    # Decimal also parses NaN and Infinity; SQLite stores NaN as NULL, which would fail the batch
+    if not values['price'].is_finite() or values['price'] < 0:
+        return None, 'Price must be a non-negative number'
+    try:
+        values['stock'] = int(row.get('stock') or 0)
+    except (TypeError, ValueError):
+        return None, 'Stock must be an integer'
+    if values['stock'] < 0:
+        return None, 'Stock must be an integer'
+    return values, None
+
+def import_books(rows, batch_size, progress=None):
+    report = {'inserted': 0, 'rejected': 0, 'batches': 0, 'errors': []}
+    max_errors = current_app.config['BOOKS_IMPORT_MAX_ERRORS']
+    
+    def record_error(error):
+        # Counts stay exact; only the first max_errors messages are kept
+        if len(report['errors']) < max_errors:
+            report['errors'].append(error)
+    
+    def flush(batch):
+        report['batches'] += 1
+        try:
+            db.session.execute(insert(Books), batch)
+            db.session.commit()
+            report['inserted'] += len(batch)
+        except SQLAlchemyError as error:
+            db.session.rollback()
+            report['rejected'] += len(batch)
+            record_error({'batch': report['batches'], 'msg': str(getattr(error, 'orig', error))})
+        if progress:
+            progress(report)
+    
+    batch = []
+    for row_number, row in enumerate(rows, 1):
+        values, error = validate_book_row(row)
+        if error:
+            report['rejected'] += 1
+            record_error({'row': row_number, 'msg': error})
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    
+    if report['inserted']:
+        bump_catalogue_version()
+    return report
+
+@bp.route('/books/<int:book_id>', methods=['PUT'])
+@jwt_required()
+def update_book(book_id):
+    data = request.get_json()
+    book = Books.query.get(book_id)
+    
+    if not book:
+        return jsonify({"msg": "Book not found"}), 404
+    
+    title = data.get('title')
+    author = data.get('author')
+    description = data.get('description')
+    price = data.get('price')
+    category = data.get('category')
+    cover_image = data.get('cover_image')
+    
+    if title:
+        book.title = title
+    if author:
+        book.author = author
+    if description:
+        book.description = description
+    if price:
+        book.price = price
+    if category:
+        book.category = category
+    if cover_image:
+        book.cover_image = cover_image
+    # Stock can legitimately be set to 0, so only a missing value is skipped
+    stock = data.get('stock')
+    if stock is not None:
+        if not isinstance(stock, int) or stock < 0:
+            return jsonify({"msg": "Stock must be a non-negative integer"}), 400
+        book.stock = stock
+    
+    db.session.commit()
+    invalidate_books(book_id)
+    return jsonify(book.todict()), 200
+
+@bp.route('/books/<int:book_id>', methods=['DELETE'])
+@jwt_required()
+def delete_book(book_id):
+    book = Books.query.get(book_id)
+    
+    if not book:
+        return jsonify({"msg": "Book not found"}), 404
+    
+    db.session.delete(book)
+    db.session.commit()
+    invalidate_books(book_id)
+    return jsonify({"msg": "Book deleted"}), 200
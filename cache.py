@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Both backends share one small interface (get / set / delete / clear / stats), so
+# the app never cares which one it has and a Redis or memcached client exposing
+# the same methods can be dropped in for production.
+
+
+class LRUCache:
+    """Bounded in-process cache: least recently used entries are evicted once
+    ``maxsize`` is reached, and every entry expires ``ttl`` seconds after it was set."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': hit_rate(self.hits, self.misses),
+                'evictions': self.evictions
+            }
+
+
+class SQLiteCache:
+    """Cache shared by every worker on the host through a SQLite file, so a
+    delete in one worker is seen by all of them. Expired rows are pruned lazily."""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path, ttl=300):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)"
+        )
+        self._connection().execute("CREATE INDEX IF NOT EXISTS ix_cache_expires_at ON cache (expires_at)")
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork: sqlite3 connections
+        # must not be shared between processes.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + (self.ttl if ttl is None else ttl))
+        )
+        with self._lock:
+            self._sets += 1
+            prune = self._sets % self.PRUNE_EVERY == 0
+        if prune:
+            pruned = connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+            with self._lock:
+                self.evictions += pruned
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def stats(self):
+        size = self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        with self._lock:
+            return {
+                'backend': 'sqlite',
+                'size': size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': hit_rate(self.hits, self.misses),
+                'evictions': self.evictions
+            }
+
+
+def hit_rate(hits, misses):
+    lookups = hits + misses
+    return round(hits / lookups, 4) if lookups else None
+
+
+def create_cache(config):
+    backend = config['CACHE_BACKEND']
+    # Read-your-writes markers have to reach whichever worker serves the writer's next read
+    if backend == 'memory' and 'replica' in config['SQLALCHEMY_BINDS'] and config['REPLICA_READ_YOUR_WRITES']:
+        raise ValueError("A read replica with REPLICA_READ_YOUR_WRITES needs a shared CACHE_BACKEND")
+    if backend == 'memory':
+        return LRUCache(config['CACHE_SIZE'], config['CACHE_TTL'])
+    if backend == 'sqlite':
+        return SQLiteCache(config['CACHE_PATH'], config['CACHE_TTL'])
+    raise ValueError("Unknown CACHE_BACKEND: %s" % backend)
@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+from flask import Response, current_app, g, make_response, request
+from functools import wraps
+import time
+import zlib
+from extensions import cache
+
+
+def catalogue_version():
+    # Catalogue cache keys embed this stamp, so changing it orphans every cached
+    # listing at once, in every worker sharing the backend. Keys are never enumerated.
+    version = cache.get('catalogue:version')
+    if version is None:
+        version = bump_catalogue_version()
+    return version
+
+def bump_catalogue_version():
+    # A timestamp rather than a counter: if the stamp is ever evicted, the new one
+    # can't collide with a stamp that is still embedded in live keys
+    version = str(time.time_ns())
+    cache.set('catalogue:version', version)
+    return version
+
+def invalidate_books(*book_ids):
+    for book_id in book_ids:
+        cache.delete('book:%d' % book_id)
+        cache.delete('replica:book:%d' % book_id)
+    bump_catalogue_version()
+
+def cached_response(key):
+    # Requests on the primary only see entries filled from the primary. Replica
+    # requests may also use replica-filled entries, which are no staler than the replica.
+    value = cache.get(key)
+    if value is None and g.get('use_replica'):
+        value = cache.get('replica:' + key)
+    return value
+
+def cache_response(key, value):
+    if g.get('use_replica'):
+        # A lagging replica can return rows from before a write that just invalidated
+        # this key. Keep them apart from primary entries, so the writer's own reads never
+        # see them, and only for as long as the replica is allowed to lag (not at all with 0).
+        window = current_app.config['REPLICA_READ_YOUR_WRITES']
+        if window:
+            cache.set('replica:' + key, value, ttl=window)
+    else:
+        cache.set(key, value)
+
+def cached_catalogue_view(view):
+    # Caches successful JSON responses under the catalogue version and the query string,
+    # and answers conditional requests from the version alone
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = catalogue_version()
+        query = '&'.join('%s=%s' % item for item in sorted(request.args.items(multi=True)))
+        key = 'catalogue:%s:%s:%s' % (version, request.path, query)
+        # The version stamps the primary, but a lagging replica can still serve the rows
+        # from before it, so replica-served listings carry no validators and never get a 304
+        validated = not g.get('use_replica')
+        etag = '%s-%x' % (version, zlib.crc32(key.encode()))
+        last_modified = datetime.fromtimestamp(int(version) / 1e9, timezone.utc)
+        if validated and is_fresh(etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        body = cached_response(key)
+        if body is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            cache_response(key, body)
+        if not validated:
+            return Response(body, mimetype='application/json')
+        return conditional_response(body, etag, last_modified)
+    return wrapper
+
+def is_fresh(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since when both are sent
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def not_modified(etag, last_modified):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+def conditional_response(body, etag, last_modified):
+    if is_fresh(etag, last_modified):
+        return not_modified(etag, last_modified)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
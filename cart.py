@@ -0,0 +1,267 @@
+from decimal import Decimal
+from flask import Blueprint, jsonify, request
+from sqlalchemy import bindparam, case, delete, insert, literal, select, update
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import joinedload
+from flask_jwt_extended import current_user, jwt_required
+from caching import invalidate_books
+from extensions import db
+from idempotency import idempotent
+from models import Books, Cart, Order, OrderItem
+from replica import replica_read
+from throttling import rate_limited
+
+bp = Blueprint('cart', __name__)
+
+def upsert(model):
+    # INSERT ... ON CONFLICT DO UPDATE comes from the dialect's own insert()
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Imported here so SQLite deployments never load the PostgreSQL dialect
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+@bp.route('/cart', methods=['POST'])
+@jwt_required()
+@idempotent
+def add_to_cart():
+    data = request.get_json()
+    user_id = current_user['id']
+    
+    book_id = data.get('book_id')
+    quantity = data.get('quantity', 1)
+    
+    if book_id is None or quantity is None:
+        return jsonify({"msg": "Book ID or quantity is missing"}), 400
+    if not isinstance(quantity, int) or quantity < 1:
+        return jsonify({"msg": "Quantity must be a positive integer"}), 400
+    
+    # A single statement: the SELECT only yields a row when the book exists, and a
+    # conflict on (user_id, book_id) adds to the existing quantity instead of inserting
+    source = select(literal(user_id), Books.id, literal(quantity)).where(Books.id == book_id)
+    stmt = upsert(Cart).from_select(['user_id', 'book_id', 'quantity'], source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'book_id'],
+        set_={'quantity': Cart.quantity + stmt.excluded.quantity}
+    )
+    if db.session.execute(stmt).rowcount == 0:
+        db.session.rollback()
+        return jsonify({"msg": "Book not found"}), 404
+    
+    db.session.commit()
+    return jsonify({"msg": "Book added to cart"}), 201
+
+@bp.route('/cart', methods=['GET'])
+@jwt_required()
+@rate_limited(cost=1)
+@replica_read
+def view_cart():
+    user_id = current_user['id']
+    # One query: each line item comes back with just the book columns the cart shows
+    cart_items = (
+        Cart.query
+        .options(joinedload(Cart.book).load_only(Books.title, Books.price, Books.cover_image))
+        .filter_by(user_id=user_id)
+        .order_by(Cart.id)
+        .all()
+    )
+    return jsonify(cart_summary(cart_items)), 200
+
+def cart_summary(cart_items):
+    # Also used by the ASGI app in asgi.py; each item needs its book loaded
+    items = []
+    total = Decimal(0)
+    for item in cart_items:
+        line = item.todict()
+        # The book may have been deleted since it was added to the cart
+        if item.book:
+            subtotal = item.book.price * item.quantity
+            total += subtotal
+            line['book'] = {
+                'title': item.book.title,
+                'price': str(item.book.price),
+                'cover_image': item.book.cover_image
+            }
+            line['subtotal'] = str(subtotal)
+        else:
+            line['book'] = None
+            line['subtotal'] = None
+        items.append(line)
+    return {
+        'items': items,
+        'item_count': sum(item.quantity for item in cart_items),
+        'total': str(total)
+    }
+
+@bp.route('/cart', methods=['PATCH'])
+@jwt_required()
+def bulk_update_cart():
+    data = request.get_json()
+    operations = data.get('operations') if isinstance(data, dict) else None
+    
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"msg": "A list of operations is required"}), 400
+    
+    user_id = current_user['id']
+    results = [None] * len(operations)
+    valid = []
+    for index, operation in enumerate(operations):
+        error = cart_operation_error(operation)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'msg': error}
+        else:
+            valid.append((index, operation))
+    
+    # Every referenced book is checked with one IN query. Removes skip the check so
+    # lines for books deleted from the catalogue can still be cleared.
+    book_ids = {operation['book_id'] for _, operation in valid if operation['op'] != 'remove'}
+    existing = set(db.session.scalars(select(Books.id).where(Books.id.in_(book_ids)))) if book_ids else set()
+    
+    # Fold the operations into one net change per book, in request order
+    changes = {}
+    for index, operation in valid:
+        book_id = operation['book_id']
+        if operation['op'] != 'remove' and book_id not in existing:
+            results[index] = {'index': index, 'status': 'error', 'msg': 'Book not found'}
+            continue
+        if operation['op'] == 'add':
+            kind, quantity = changes.get(book_id, ('add', 0))
+            changes[book_id] = (kind, quantity + operation['quantity'])
+        elif operation['op'] == 'set':
+            changes[book_id] = ('set', operation['quantity'])
+        else:
+            changes[book_id] = ('set', 0)
+        results[index] = {'index': index, 'status': 'ok'}
+    
+    # Then apply them as at most three bulk statements and a single commit
+    increments = [{'user_id': user_id, 'book_id': book_id, 'quantity': quantity}
+                  for book_id, (kind, quantity) in changes.items() if kind == 'add']
+    replacements = [{'user_id': user_id, 'book_id': book_id, 'quantity': quantity}
+                    for book_id, (kind, quantity) in changes.items() if kind == 'set' and quantity > 0]
+    removals = [book_id for book_id, (kind, quantity) in changes.items() if kind == 'set' and quantity == 0]
+    
+    if increments:
+        stmt = cart_upsert()
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id', 'book_id'],
+            set_={'quantity': Cart.__table__.c.quantity + stmt.excluded.quantity}
+        ), increments)
+    if replacements:
+        stmt = cart_upsert()
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id', 'book_id'],
+            set_={'quantity': stmt.excluded.quantity}
+        ), replacements)
+    if removals:
+        db.session.execute(delete(Cart).where(Cart.user_id == user_id, Cart.book_id.in_(removals)))
+    
+    db.session.commit()
+    return jsonify({'results': results}), 200
+
+def cart_operation_error(operation):
+    if not isinstance(operation, dict):
+        return 'Operation must be an object'
+    if operation.get('op') not in ('add', 'set', 'remove'):
+        return 'op must be add, set or remove'
+    if not isinstance(operation.get('book_id'), int):
+        return 'Book ID is missing'
+    if operation['op'] == 'remove':
+        return None
+    quantity = operation.get('quantity')
+    minimum = 1 if operation['op'] == 'add' else 0
+    if not isinstance(quantity, int) or quantity < minimum:
+        return 'Quantity must be an integer of at least %d' % minimum
+    return None
+
+def cart_upsert():
+    # Built on the Core table so a list of parameter sets runs as one executemany
+    return upsert(Cart.__table__).values(
+        user_id=bindparam('user_id'),
+        book_id=bindparam('book_id'),
+        quantity=bindparam('quantity')
+    )
+
+@bp.route('/cart/<int:item_id>', methods=['PUT'])
+@jwt_required()
+def update_cart_item(item_id):
+    data = request.get_json()
+    quantity = data.get('quantity')
+    
+    user_id = current_user['id']
+    cart_item = Cart.query.get(item_id)
+    
+    if not cart_item or cart_item.user_id != user_id:
+        return jsonify({"msg": "Cart item not found or unauthorized"}), 404
+    
+    if quantity is not None:
+        cart_item.quantity = quantity
+    
+    db.session.commit()
+    return jsonify(cart_item.todict()), 200
+
+@bp.route('/cart/<int:item_id>', methods=['DELETE'])
+@jwt_required()
+def remove_from_cart(item_id):
+    user_id = current_user['id']
+    cart_item = Cart.query.get(item_id)
+    
+    if not cart_item or cart_item.user_id != user_id:
+        return jsonify({"msg": "Cart item not found or unauthorized"}), 404
+    
+    db.session.delete(cart_item)
+    db.session.commit()
+    return jsonify({"msg": "Cart item removed"}), 200
+
+@bp.route('/checkout', methods=['POST'])
+@jwt_required()
+@idempotent
+def checkout():
+    user_id = current_user['id']
+    
+    # Everything below is one transaction made of set-based statements, whatever the cart size.
+    # Taking the lines out of the cart first reads them exactly once and claims them: the
+    # DELETE locks these rows (the whole database on SQLite), so a concurrent checkout or cart
+    # change waits for this one, and every later step works from the same lines. A rollback
+    # puts them back; a line added meanwhile stays in the cart for next time.
+    lines = db.session.execute(
+        delete(Cart).where(Cart.user_id == user_id).returning(Cart.book_id, Cart.quantity)
+    ).all()
+    
+    if not lines:
+        db.session.rollback()
+        return jsonify({"msg": "Cart is empty"}), 400
+    
+    # Then take stock for every line at once: a book only gets decremented if it has
+    # enough left, so anything short of one updated row per line means an oversell
+    wanted = dict(lines)
+    quantity = case(wanted, value=Books.id)
+    prices = dict(db.session.execute(
+        update(Books)
+        .where(Books.id.in_(wanted), Books.stock >= quantity)
+        .values(stock=Books.stock - quantity)
+        .returning(Books.id, Books.price)
+        .execution_options(synchronize_session=False)
+    ).all())
+    
+    if len(prices) != len(wanted):
+        short = [book_id for book_id in wanted if book_id not in prices]
+        available = dict(db.session.execute(select(Books.id, Books.stock).where(Books.id.in_(short))).all())
+        db.session.rollback()
+        return jsonify({
+            "msg": "Insufficient stock",
+            "items": [{'book_id': book_id, 'requested': wanted[book_id], 'available': available.get(book_id) or 0}
+                      for book_id in short]
+        }), 409
+    
+    # The order is built from those same lines, at the prices the UPDATE saw
+    order = Order(user_id=user_id)
+    db.session.add(order)
+    db.session.flush()
+    items = [{'order_id': order.id, 'book_id': book_id, 'quantity': quantity, 'unit_price': prices[book_id]}
+             for book_id, quantity in lines]
+    db.session.execute(insert(OrderItem), items)
+    order.total = sum(item['quantity'] * item['unit_price'] for item in items)
+    db.session.commit()
+    invalidate_books(*wanted)
+    
+    return jsonify({"msg": "Checkout completed", "order": order.todict()}), 200
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, text
+from sqlalchemy.schema import CreateColumn
+import click
+import sqlite3
+from books import import_books, read_book_rows
+from extensions import db
+from models import BOOKS_FTS_DDL, IdempotencyKey, RevokedToken
+
+
+@click.command('db_create')
+@with_appcontext
+def db_create():
+    db.create_all()
+    # create_all() skips tables that already exist, so add any columns and indexes declared since
+    inspector = db.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    connection.execute(text('ALTER TABLE %s ADD COLUMN %s' % (preparer.format_table(table), ddl)))
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    print("Database is created")
+
+@click.command('fts_rebuild')
+@with_appcontext
+def fts_rebuild():
+    # Creates the search index on databases that predate it and repopulates it from Books
+    if db.engine.dialect.name != 'sqlite':
+        print("The search index needs SQLite FTS5")
+        return
+    with db.engine.begin() as connection:
+        for statement in BOOKS_FTS_DDL:
+            connection.execute(statement)
+        connection.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+    print("Search index is rebuilt")
+
+@click.command('prune_idempotency_keys')
+@with_appcontext
+def prune_idempotency_keys():
+    cutoff = datetime.now() - timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+    pruned = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)).rowcount
+    db.session.commit()
+    print("Pruned %d idempotency keys" % pruned)
+
+@click.command('prune_revoked_tokens')
+@with_appcontext
+def prune_revoked_tokens():
+    # Expired tokens are refused anyway, so their revocations can go
+    pruned = db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.now())).rowcount
+    db.session.commit()
+    print("Pruned %d revoked tokens" % pruned)
+
+@click.command('replica_sync')
+@with_appcontext
+def replica_sync():
+    # Local stand-in for replication: copies the primary SQLite file onto the replica file
+    replica = db.engines.get('replica')
+    if replica is None or replica.dialect.name != 'sqlite' or db.engine.dialect.name != 'sqlite':
+        print("replica_sync needs SQLite primary and replica databases")
+        return
+    source = sqlite3.connect(db.engine.url.database)
+    target = sqlite3.connect(replica.url.database)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+    print("Replica is synced")
+
+@click.command('db_drop')
+@with_appcontext
+def db_drop():
+    db.drop_all()
+    print("DB is dropped")
+
+@click.command('import_books')
+@with_appcontext
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=None, help='Rows per INSERT batch and commit.')
+def import_books_command(path, batch_size):
+    # Loads a .csv or .jsonl/.ndjson catalogue file, streaming it in batches
+    import_format = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+    with open(path, newline='', encoding='utf-8') as file:
+        report = import_books(
+            read_book_rows(file, import_format),
+            batch_size or current_app.config['BOOKS_IMPORT_BATCH_SIZE'],
+            progress=lambda report: print("Batch %d: %d inserted, %d rejected" % (
+                report['batches'], report['inserted'], report['rejected']))
+        )
+    for error in report['errors']:
+        print("Row %s: %s" % (error.get('row', '-'), error['msg']))
+    print("Imported %d books, rejected %d" % (report['inserted'], report['rejected']))
+
+
+# Registered on every app by create_app()
+commands = [db_create, fts_rebuild, prune_idempotency_keys, prune_revoked_tokens, replica_sync, db_drop, import_books_command]
@@ -0,0 +1,152 @@
+import os
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_url():
+    url = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'bookstore.db'))
+    # Some hosts still hand out the old postgres:// scheme, which SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url):
+    # Pool settings are for server databases; SQLite files keep SQLAlchemy's defaults
+    if url.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': env_int('DB_POOL_SIZE', 5),
+        'max_overflow': env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': env_int('DB_POOL_TIMEOUT', 30),
+        # Connections idle longer than this are replaced before a proxy or server drops them
+        'pool_recycle': env_int('DB_POOL_RECYCLE', 1800),
+        # Checks each connection on checkout, so a restarted server costs a retry rather than a 500
+        'pool_pre_ping': env_bool('DB_POOL_PRE_PING', True)
+    }
+    statement_timeout = env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+    if statement_timeout and url.startswith('postgresql'):
+        options['connect_args'] = {'options': '-c statement_timeout=%d' % statement_timeout}
+    return options
+
+
+def async_database_url(url):
+    # The same database through an asyncio driver, for the ASGI app in asgi.py
+    if url.startswith('sqlite:'):
+        return 'sqlite+aiosqlite:' + url[len('sqlite:'):]
+    if url.startswith('postgresql:'):
+        return 'postgresql+asyncpg:' + url[len('postgresql:'):]
+    return url
+
+
+def async_engine_options(url):
+    options = engine_options(url)
+    # asyncpg takes server settings directly rather than a libpq options string
+    statement_timeout = env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+    if options.pop('connect_args', None):
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(statement_timeout)}}
+    return options
+
+
+def sqlite_pragma_listener(pragmas):
+    # A 'connect' event listener that applies SQLITE_PRAGMAS to each new SQLite connection
+    def apply_sqlite_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+        cursor.close()
+    return apply_sqlite_pragmas
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'kavya')
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'kavya')
+
+    # Decoded access tokens kept per worker so repeat requests skip the signature check.
+    # 0 (the default) turns the cache off; entries never outlive the token's exp.
+    JWT_DECODE_CACHE_SIZE = env_int('JWT_DECODE_CACHE_SIZE', 0)
+    JWT_DECODE_CACHE_TTL = env_int('JWT_DECODE_CACHE_TTL', 300)
+    # Revoked tokens are looked up through a Bloom filter sized for this many entries at this
+    # false positive rate. Each worker picks up logouts made elsewhere within REFRESH seconds,
+    # at the cost of one small query per interval, and rebuilds the filter every REBUILD seconds.
+    JWT_BLOCKLIST_CAPACITY = env_int('JWT_BLOCKLIST_CAPACITY', 10000)
+    JWT_BLOCKLIST_FALSE_POSITIVE_RATE = 0.001
+    JWT_BLOCKLIST_REFRESH = env_int('JWT_BLOCKLIST_REFRESH', 5)
+    JWT_BLOCKLIST_REBUILD = env_int('JWT_BLOCKLIST_REBUILD', 600)
+
+    # Any werkzeug.security method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'.
+    # Changing it rehashes each password the next time its owner logs in.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Hashes run on this many threads per worker process; further logins queue for a slot
+    PASSWORD_HASH_WORKERS = env_int('PASSWORD_HASH_WORKERS', 2)
+    # A login that waits longer than this (seconds) for a slot gets a 503
+    PASSWORD_HASH_TIMEOUT = env_int('PASSWORD_HASH_TIMEOUT', 10)
+
+    # 'memory' limits each worker process separately; 'sqlite' shares the limits through RATE_LIMIT_PATH
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH', os.path.join(basedir, 'ratelimit.db'))
+    # Login and register attempts: a burst of this many, then PER_MINUTE (at least 1) more each minute
+    LOGIN_IP_BURST = env_int('LOGIN_IP_BURST', 20)
+    LOGIN_IP_PER_MINUTE = env_int('LOGIN_IP_PER_MINUTE', 20)
+    LOGIN_EMAIL_BURST = env_int('LOGIN_EMAIL_BURST', 5)
+    LOGIN_EMAIL_PER_MINUTE = env_int('LOGIN_EMAIL_PER_MINUTE', 2)
+    # Catalogue and cart reads: each client may spend RATE_LIMIT cost units per RATE_LIMIT_WINDOW
+    # seconds. A single book costs 1, a listing 5, a search 10, an export 50. 0 turns it off.
+    RATE_LIMIT = env_int('RATE_LIMIT', 600)
+    RATE_LIMIT_WINDOW = env_int('RATE_LIMIT_WINDOW', 60)
+    # Set to the number of reverse proxies in front of the app, so limits see the client's address
+    PROXY_FIX_X_FOR = env_int('PROXY_FIX_X_FOR', 0)
+
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Optional read replica for catalogue and cart reads. For local testing point it at a
+    # second SQLite file and refresh it with `flask replica_sync`.
+    SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URL']} if os.environ.get('DATABASE_REPLICA_URL') else {}
+    # After a write, that user's reads go to the primary for this many seconds. The marker
+    # must be seen by every worker, so a replica needs CACHE_BACKEND=sqlite unless this is 0.
+    REPLICA_READ_YOUR_WRITES = env_int('REPLICA_READ_YOUR_WRITES', 5)
+    # Used by the ASGI app; derived from the URLs above unless set explicitly
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL') or async_database_url(SQLALCHEMY_DATABASE_URI)
+    ASYNC_DATABASE_REPLICA_URL = os.environ.get('ASYNC_DATABASE_REPLICA_URL') or (
+        async_database_url(SQLALCHEMY_BINDS['replica']) if SQLALCHEMY_BINDS else None)
+    # Applied to every new SQLite connection. WAL lets readers carry on while a writer commits,
+    # and busy_timeout makes writers wait for the lock instead of failing with "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # Durable with WAL except on power loss; far fewer fsyncs than FULL
+        'busy_timeout': 5000,  # milliseconds
+        'cache_size': -20000,  # Negative values are KiB, so about 20 MB of page cache per connection
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY'
+    }
+
+    BOOKS_PAGE_SIZE = 50
+    BOOKS_MAX_PAGE_SIZE = 500
+    BOOKS_EXPORT_BATCH_SIZE = 1000
+    BOOKS_IMPORT_BATCH_SIZE = 1000
+    BOOKS_IMPORT_MAX_ERRORS = 1000
+
+    # 'memory' is per process; 'sqlite' is shared by every worker through CACHE_PATH
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_PATH = os.environ.get('CACHE_PATH', os.path.join(basedir, 'cache.db'))
+    CACHE_SIZE = 1024
+    CACHE_TTL = 300
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 300
+
+    # Stored responses for Idempotency-Key retries are kept this long (seconds)
+    IDEMPOTENCY_TTL = 24 * 60 * 60
+    # A key whose original request never finished is released after this long (seconds)
+    IDEMPOTENCY_LOCK_TIMEOUT = 60
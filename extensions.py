@@ -0,0 +1,51 @@
+from flask import current_app, g, has_request_context
+from flask_jwt_extended import JWTManager
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from werkzeug.local import LocalProxy
+import hashlib
+import time
+
+
+class RoutingSession(Session):
+    # Views marked with @replica_read run their queries on the 'replica' bind when one is
+    # configured; everything else, including every write, stays on the primary
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and g.get('use_replica') and 'replica' in db.engines:
+            return db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class CachingJWTManager(JWTManager):
+    # With JWT_DECODE_CACHE_SIZE set, a token seen before skips the signature check and
+    # claim validation. Entries expire no later than the token itself; the blocklist
+    # check runs after this, so a revoked token is still refused.
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        decoded_tokens = current_app.extensions.get('bookstore_token_cache')
+        if decoded_tokens is None or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        # Keyed by a digest so the cache never holds usable tokens
+        key = hashlib.sha256(encoded_token.encode()).digest()
+        claims = decoded_tokens.get(key)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            ttl = current_app.config['JWT_DECODE_CACHE_TTL']
+            if 'exp' in claims:
+                ttl = min(ttl, claims['exp'] - time.time())
+            if ttl > 0:
+                decoded_tokens.set(key, claims, ttl)
+        return dict(claims)
+
+
+# Bound to an application in create_app()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+jwt = CachingJWTManager()
+
+# Serialized book and catalogue payloads, and email -> user id for tokens issued before
+# the uid claim existed. Each app builds its own in create_app().
+cache = LocalProxy(lambda: current_app.extensions['bookstore_cache'])
+user_cache = LocalProxy(lambda: current_app.extensions['bookstore_user_cache'])
+password_hasher = LocalProxy(lambda: current_app.extensions['bookstore_password_hasher'])
+login_limiter = LocalProxy(lambda: current_app.extensions['bookstore_login_limiter'])
+rate_limiter = LocalProxy(lambda: current_app.extensions['bookstore_rate_limiter'])
+blocklist = LocalProxy(lambda: current_app.extensions['bookstore_blocklist'])
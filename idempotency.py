@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from flask import Response, current_app, jsonify, make_response, request
+from flask_jwt_extended import current_user
+from functools import wraps
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+import hashlib
+from extensions import db
+from models import IdempotencyKey
+
+
+def idempotent(view):
+    # Requests sent with an Idempotency-Key header run once; retries with the same key get
+    # the stored response back from a single primary-key lookup. Goes below @jwt_required().
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        client_key = request.headers.get('Idempotency-Key')
+        if not client_key:
+            return view(*args, **kwargs)
+        if len(client_key) > 255:
+            return jsonify({"msg": "Idempotency-Key is too long"}), 400
+        
+        key = '%s:%s %s:%s' % (current_user['id'], request.method, request.path, client_key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        record = db.session.get(IdempotencyKey, key)
+        
+        if record and idempotency_key_expired(record):
+            db.session.delete(record)
+            db.session.commit()
+            record = None
+        if record:
+            if record.fingerprint != fingerprint:
+                return jsonify({"msg": "Idempotency-Key was already used for a different request"}), 422
+            if record.status_code is None:
+                return jsonify({"msg": "A request with this Idempotency-Key is still in progress"}), 409
+            response = Response(record.body, status=record.status_code, mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        # Claim the key before running the view so concurrent retries can't both execute it
+        db.session.add(IdempotencyKey(key=key, fingerprint=fingerprint))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"msg": "A request with this Idempotency-Key is still in progress"}), 409
+        
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            release_idempotency_key(key)
+            raise
+        
+        # Server errors are not stored, so the client may retry them for real
+        if response.status_code >= 500:
+            release_idempotency_key(key)
+        else:
+            db.session.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(status_code=response.status_code, body=response.get_data())
+            )
+            db.session.commit()
+        return response
+    return wrapper
+
+def idempotency_key_expired(record):
+    age = datetime.now() - record.created_at
+    if record.status_code is None:
+        return age > timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+    return age > timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+
+def release_idempotency_key(key):
+    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+    db.session.commit()
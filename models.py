@@ -0,0 +1,164 @@
+from datetime import datetime
+from sqlalchemy import DDL, column, event, table
+from extensions import db
+
+
+class user(db.Model):
+    __tablename__="USER"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String, nullable=False)
+    email = db.Column(db.String, nullable=False, unique=True)
+    pwd = db.Column(db.String, nullable=False)  # werkzeug.security hash; see passwords.py
+    datecreated = db.Column(db.DateTime, default=datetime.now())
+    
+    def todict(self):
+        return {
+            'id':self.id,
+            'username':self.username,
+            'email':self.email,
+            'datecreated':self.datecreated
+        }
+        
+class Books(db.Model):
+    __tablename__ = "Books"
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String, nullable=False)
+    author = db.Column(db.String, nullable=False, index=True)
+    description = db.Column(db.Text)
+    price = db.Column(db.Numeric, nullable=False, index=True)
+    category = db.Column(db.String, index=True)
+    cover_image = db.Column(db.String)  # URL to the cover image
+    stock = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.now())
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    FIELDS = ('id', 'title', 'author', 'description', 'price', 'category', 'cover_image', 'stock', 'created_at', 'updated_at')
+    # description is by far the largest column, so list views leave it out unless asked
+    LIST_FIELDS = tuple(field for field in FIELDS if field != 'description')
+
+    def todict(self, fields=None):
+        # Only touch the requested attributes so deferred columns are never loaded
+        data = {}
+        for field in fields or self.FIELDS:
+            value = getattr(self, field)
+            if field == 'price':
+                value = str(value)  # Convert Decimal to string for JSON serialization
+            elif field in ('created_at', 'updated_at') and value is not None:
+                value = value.isoformat()  # Convert datetime to ISO format string
+            data[field] = value
+        return data
+        
+
+# FTS5 index over Books, stored as an external-content table so the text is not
+# duplicated. Triggers keep it in step with every insert, update and delete on Books.
+BOOKS_FTS_DDL = [
+    DDL("""CREATE VIRTUAL TABLE IF NOT EXISTS books_fts
+           USING fts5(title, author, description, content='Books', content_rowid='id')"""),
+    DDL("""CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON "Books" BEGIN
+               INSERT INTO books_fts(rowid, title, author, description)
+               VALUES (new.id, new.title, new.author, new.description);
+           END"""),
+    DDL("""CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON "Books" BEGIN
+               INSERT INTO books_fts(books_fts, rowid, title, author, description)
+               VALUES ('delete', old.id, old.title, old.author, old.description);
+           END"""),
+    DDL("""CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author, description ON "Books" BEGIN
+               INSERT INTO books_fts(books_fts, rowid, title, author, description)
+               VALUES ('delete', old.id, old.title, old.author, old.description);
+               INSERT INTO books_fts(rowid, title, author, description)
+               VALUES (new.id, new.title, new.author, new.description);
+           END""")
+]
+
+for statement in BOOKS_FTS_DDL:
+    event.listen(Books.__table__, 'after_create', statement.execute_if(dialect='sqlite'))
+event.listen(Books.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS books_fts").execute_if(dialect='sqlite'))
+
+books_fts = table('books_fts', column('rowid'))
+        
+class Cart(db.Model):
+    __tablename__ = "Cart"
+    # One row per book per user; repeat adds increment the quantity in place
+    __table_args__ = (db.Index('ix_Cart_user_id_book_id', 'user_id', 'book_id', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('USER.id'), nullable=False)
+    book_id = db.Column(db.Integer, db.ForeignKey('Books.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.now())
+
+    user = db.relationship('user', backref='carts')
+    book = db.relationship('Books', backref='carts')
+
+    def todict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'book_id': self.book_id,
+            'quantity': self.quantity,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class Order(db.Model):
+    __tablename__ = "Orders"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('USER.id'), nullable=False, index=True)
+    total = db.Column(db.Numeric, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    user = db.relationship('user', backref='orders')
+    items = db.relationship('OrderItem', backref='order')
+
+    def todict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'total': str(self.total),
+            'items': [item.todict() for item in self.items],
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class OrderItem(db.Model):
+    __tablename__ = "OrderItems"
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('Orders.id'), nullable=False, index=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('Books.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Numeric, nullable=False)  # Price at the time of purchase
+
+    book = db.relationship('Books')
+
+    def todict(self):
+        return {
+            'book_id': self.book_id,
+            'quantity': self.quantity,
+            'unit_price': str(self.unit_price)
+        }
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "IdempotencyKeys"
+
+    # "<user id>:<method> <path>:<client key>", so keys never collide across users or routes
+    key = db.Column(db.String, primary_key=True)
+    fingerprint = db.Column(db.String, nullable=False)  # SHA-256 of the request body
+    status_code = db.Column(db.Integer)  # NULL while the original request is still running
+    body = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+
+
+class RevokedToken(db.Model):
+    __tablename__ = "RevokedTokens"
+    # Workers detect new revocations by the highest id, so ids must never be reused after pruning
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String, nullable=False, unique=True)
+    expires_at = db.Column(db.DateTime, index=True)  # NULL for tokens that never expire
+    created_at = db.Column(db.DateTime, default=datetime.now)
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+import hmac
+import os
+import threading
+
+# Hashes look like "<method>:<params>$<salt>$<hash>"; anything else is a plaintext
+# password from before hashing was introduced
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+
+class HashingBusy(Exception):
+    """Raised when a hash waited longer than PASSWORD_HASH_TIMEOUT for a free slot."""
+
+
+class PasswordHasher:
+    """Runs password hashing on a small thread pool. hashlib releases the GIL while it
+    derives a key, so at most ``workers`` cores are spent on logins and the request
+    threads serving everything else keep running."""
+
+    def __init__(self, method, workers=2, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        # One per worker thread: taking a slot before submitting keeps the queue empty,
+        # so the timeout bounds the wait for a slot and never the hash itself
+        self._slots = None
+        self._pid = None
+        self._canonical_method = None
+        # Checked when the email is unknown, so a miss costs as much as a wrong password
+        self._dummy_hash = None
+
+    def _run(self, function, *args):
+        with self._lock:
+            # Threads don't survive a fork, so each worker process gets its own pool
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                self._slots = threading.BoundedSemaphore(self.workers)
+                self._pid = os.getpid()
+            executor, slots = self._executor, self._slots
+        if not slots.acquire(timeout=self.timeout):
+            raise HashingBusy()
+        try:
+            return executor.submit(function, *args).result()
+        finally:
+            slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored, password):
+        # Returns (matches, needs_rehash)
+        if stored is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash('')
+            self._run(check_password_hash, self._dummy_hash, password)
+            return False, False
+        if not stored.startswith(HASH_PREFIXES):
+            return hmac.compare_digest(stored.encode(), password.encode()), True
+        if not self._run(check_password_hash, stored, password):
+            return False, False
+        return True, stored.split('$', 1)[0] != self.canonical_method()
+
+    def canonical_method(self):
+        # "scrypt" is stored as "scrypt:32768:8:1", so compare against the expanded form
+        if self._canonical_method is None:
+            self._canonical_method = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._canonical_method
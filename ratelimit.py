@@ -0,0 +1,240 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Like cache.py, each limiter has an in-process backend and a SQLite one shared by
+# every worker on the host. All of them answer take() with the number of seconds
+# the caller has to wait, 0 meaning the request may go ahead.
+
+
+class TokenBuckets:
+    """In-process token buckets. Each key starts with ``capacity`` tokens and regains
+    ``rate`` tokens per second; the least recently used buckets are dropped past ``maxsize``."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {}
+
+    def take(self, name, key, capacity, rate):
+        now = time.monotonic()
+        key = '%s:%s' % (name, key)
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens if wait else tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            count(self.counters, name, wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'size': len(self._buckets), 'counters': dict(self.counters)}
+
+
+class SQLiteStore:
+    """Plumbing shared by the SQLite backends: a connection per thread and process,
+    and write transactions that serialise concurrent takes across workers."""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._takes = 0
+        self.counters = {}
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def transaction(self, update):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent takes can't both
+        # spend the same allowance
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = update(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    def counted(self, name, wait):
+        # Returns True every PRUNE_EVERY takes, when the caller should drop stale rows
+        with self._lock:
+            self._takes += 1
+            count(self.counters, name, wait)
+            return self._takes % self.PRUNE_EVERY == 0
+
+
+class SQLiteTokenBuckets(SQLiteStore):
+    """Token buckets kept in a SQLite file, so every worker draws from the same bucket."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        # full_at is when the bucket will be full again; past that point the row carries no information
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets (key TEXT PRIMARY KEY, tokens REAL, updated_at REAL, full_at REAL)"
+        )
+        self._connection().execute("CREATE INDEX IF NOT EXISTS ix_token_buckets_full_at ON token_buckets (full_at)")
+
+    def take(self, name, key, capacity, rate):
+        now = time.time()
+        key = '%s:%s' % (name, key)
+
+        def update(connection):
+            row = connection.execute("SELECT tokens, updated_at FROM token_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            connection.execute(
+                "INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            return wait
+
+        wait = self.transaction(update)
+        if self.counted(name, wait):
+            self._connection().execute("DELETE FROM token_buckets WHERE full_at <= ?", (now,))
+        return wait
+
+    def stats(self):
+        size = self._connection().execute("SELECT COUNT(*) FROM token_buckets").fetchone()[0]
+        with self._lock:
+            return {'backend': 'sqlite', 'size': size, 'counters': dict(self.counters)}
+
+
+class SlidingWindows:
+    """In-process sliding-window counters. Each key may spend ``limit`` units per
+    ``window`` seconds; the least recently used keys are dropped past ``maxsize``."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {}
+
+    def take(self, name, key, cost, limit, window):
+        now = time.time()
+        index, elapsed = divmod(now / window, 1)
+        with self._lock:
+            previous, current = advance(self._windows.get(key), index)
+            wait = window_wait(previous, current, elapsed, cost, limit, window)
+            self._windows[key] = (index, previous, current if wait else current + cost)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.maxsize:
+                self._windows.popitem(last=False)
+            count(self.counters, name, wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'size': len(self._windows), 'counters': dict(self.counters)}
+
+
+class SQLiteSlidingWindows(SQLiteStore):
+    """Sliding-window counters kept in a SQLite file, so a client's allowance is shared by every worker."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS sliding_windows "
+            "(key TEXT PRIMARY KEY, window_index REAL, previous REAL, current REAL)"
+        )
+
+    def take(self, name, key, cost, limit, window):
+        now = time.time()
+        index, elapsed = divmod(now / window, 1)
+
+        def update(connection):
+            row = connection.execute(
+                "SELECT window_index, previous, current FROM sliding_windows WHERE key = ?", (key,)
+            ).fetchone()
+            previous, current = advance(row, index)
+            wait = window_wait(previous, current, elapsed, cost, limit, window)
+            connection.execute(
+                "INSERT OR REPLACE INTO sliding_windows (key, window_index, previous, current) VALUES (?, ?, ?, ?)",
+                (key, index, previous, current if wait else current + cost)
+            )
+            return wait
+
+        wait = self.transaction(update)
+        if self.counted(name, wait):
+            # Rows two windows old count for nothing any more
+            self._connection().execute("DELETE FROM sliding_windows WHERE window_index < ?", (index - 1,))
+        return wait
+
+    def stats(self):
+        size = self._connection().execute("SELECT COUNT(*) FROM sliding_windows").fetchone()[0]
+        with self._lock:
+            return {'backend': 'sqlite', 'size': size, 'counters': dict(self.counters)}
+
+
+def advance(entry, index):
+    # Returns the (previous, current) window totals as of window number ``index``
+    if entry is None:
+        return 0, 0
+    entry_index, previous, current = entry
+    if entry_index == index:
+        return previous, current
+    if entry_index == index - 1:
+        return current, 0
+    return 0, 0
+
+
+def window_wait(previous, current, elapsed, cost, limit, window):
+    # The previous window is weighted by how much of it still overlaps the sliding
+    # window, so usage decays smoothly instead of resetting at each boundary
+    if previous * (1 - elapsed) + current + cost <= limit:
+        return 0
+    if cost > limit:
+        return window
+    if current + cost <= limit:
+        # Wait until enough of the previous window has slid out
+        return ((1 - (limit - current - cost) / previous) - elapsed) * window
+    # Wait for the next window, then for enough of this one to slide out
+    return (1 - elapsed + max(0, 1 - (limit - cost) / current)) * window
+
+
+def count(counters, name, wait):
+    counter = counters.setdefault(name, {'allowed': 0, 'rejected': 0})
+    counter['rejected' if wait else 'allowed'] += 1
+
+
+def create_token_buckets(config):
+    # Buckets that never refill would lock a client out for good, and take() divides by the rate
+    for name in ('LOGIN_IP_PER_MINUTE', 'LOGIN_EMAIL_PER_MINUTE'):
+        if config[name] < 1:
+            raise ValueError("%s must be at least 1" % name)
+    backend = config['RATE_LIMIT_BACKEND']
+    if backend == 'memory':
+        return TokenBuckets()
+    if backend == 'sqlite':
+        return SQLiteTokenBuckets(config['RATE_LIMIT_PATH'])
+    raise ValueError("Unknown RATE_LIMIT_BACKEND: %s" % backend)
+
+
+def create_sliding_windows(config):
+    backend = config['RATE_LIMIT_BACKEND']
+    if backend == 'memory':
+        return SlidingWindows()
+    if backend == 'sqlite':
+        return SQLiteSlidingWindows(config['RATE_LIMIT_PATH'])
+    raise ValueError("Unknown RATE_LIMIT_BACKEND: %s" % backend)
@@ -0,0 +1,28 @@
+from flask import current_app, g, request
+from functools import wraps
+from auth import request_user_id
+from extensions import cache, db
+
+
+def replica_read(view):
+    # Sends a read-only view to the replica, unless the caller wrote something within the
+    # last REPLICA_READ_YOUR_WRITES seconds and the replica may not have caught up yet
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = not wrote_recently()
+        return view(*args, **kwargs)
+    return wrapper
+
+def wrote_recently():
+    if 'replica' not in db.engines:
+        return True
+    user_id = request_user_id()
+    return user_id is not None and cache.get('wrote:%s' % user_id) is not None
+
+def remember_write(response):
+    window = current_app.config['REPLICA_READ_YOUR_WRITES']
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400 and window and 'replica' in db.engines:
+        user_id = request_user_id()
+        if user_id is not None:
+            cache.set('wrote:%s' % user_id, '1', ttl=window)
+    return response
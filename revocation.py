@@ -0,0 +1,129 @@
+from datetime import datetime
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import IntegrityError
+import threading
+import time
+from bloom import BloomFilter
+from extensions import db
+from models import RevokedToken
+
+
+class Blocklist:
+    """Revoked token ids, kept in the RevokedTokens table and fronted by a Bloom filter.
+    A jti the filter has never seen is cleared without touching the database; only the
+    rare filter hit is confirmed with an indexed lookup.
+
+    The table is what the workers share. Every ``refresh`` seconds each worker reads
+    a watermark (row count and highest id) from the primary. When it moves, the worker
+    adds the new rows to its filter, or rebuilds it if rows went missing. Every
+    ``rebuild`` seconds the filter is rebuilt regardless, to drop expired tokens."""
+
+    def __init__(self, capacity=10000, false_positive_rate=0.001, refresh=5, rebuild=600):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.refresh = refresh
+        self.rebuild_after = rebuild
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._filter = None
+        self._watermark = (0, 0)
+        self._checked_at = 0
+        self._built_at = 0
+        self.checks = 0
+        self.database_lookups = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+
+    def is_revoked(self, jti):
+        bloom = self._current()
+        if jti not in bloom:
+            with self._lock:
+                self.checks += 1
+            return False
+        revoked = primary_scalar(select(RevokedToken.id).where(RevokedToken.jti == jti)) is not None
+        with self._lock:
+            self.checks += 1
+            self.database_lookups += 1
+            self.false_positives += not revoked
+        return revoked
+
+    def revoke(self, jti, expires_at):
+        db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Already revoked by a concurrent request
+            db.session.rollback()
+        # Seen here at once; other workers pick the row up at their next refresh
+        self._current().add(jti)
+
+    def _current(self):
+        if self._filter is not None and time.monotonic() - self._checked_at < self.refresh:
+            return self._filter
+        # One thread refreshes while the others carry on with the current filter
+        if not self._refresh_lock.acquire(blocking=self._filter is None):
+            return self._filter
+        try:
+            now = time.monotonic()
+            if self._filter is not None and now - self._checked_at < self.refresh:
+                return self._filter
+            if self._filter is None or now - self._built_at >= self.rebuild_after:
+                self._rebuild()
+            else:
+                self._catch_up()
+            self._checked_at = now
+            return self._filter
+        finally:
+            self._refresh_lock.release()
+
+    def _catch_up(self):
+        count, last_id = primary_execute(select(func.count(), func.coalesce(func.max(RevokedToken.id), 0))).one()
+        known_count, known_id = self._watermark
+        if (count, last_id) == self._watermark:
+            return
+        jtis = primary_scalars(
+            select(RevokedToken.jti).where(RevokedToken.id > known_id, RevokedToken.id <= last_id)
+        )
+        if count - known_count != len(jtis):
+            # Rows were pruned, or one committed below the old watermark after it was read
+            self._rebuild()
+            return
+        for jti in jtis:
+            self._filter.add(jti)
+        self._watermark = (count, last_id)
+
+    def _rebuild(self):
+        # The watermark is read first, so rows committed during the scan are caught up next time
+        count, last_id = primary_execute(select(func.count(), func.coalesce(func.max(RevokedToken.id), 0))).one()
+        jtis = primary_scalars(
+            select(RevokedToken.jti)
+            .where(or_(RevokedToken.expires_at.is_(None), RevokedToken.expires_at > datetime.now()))
+        )
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.false_positive_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter, self._watermark, self._built_at = bloom, (count, last_id), time.monotonic()
+        with self._lock:
+            self.rebuilds += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'filter_bits': None if self._filter is None else self._filter.bits,
+                'watermark': self._watermark[1],
+                'checks': self.checks,
+                'database_lookups': self.database_lookups,
+                'false_positives': self.false_positives,
+                'rebuilds': self.rebuilds
+            }
+
+
+# Revocations must be seen at once, so they are never read from a lagging replica
+def primary_execute(statement):
+    return db.session.execute(statement, bind_arguments={'bind': db.engine})
+
+def primary_scalar(statement):
+    return db.session.scalar(statement, bind_arguments={'bind': db.engine})
+
+def primary_scalars(statement):
+    return db.session.scalars(statement, bind_arguments={'bind': db.engine}).all()
@@ -0,0 +1,51 @@
+import pytest
+from app import create_app
+from config import Config
+from extensions import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        # A file rather than :memory: so request threads share one database
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'bookstore.db')
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {}
+        CACHE_BACKEND = 'memory'
+        RATE_LIMIT_BACKEND = 'memory'
+        RATE_LIMIT = 0
+        LOGIN_IP_BURST = 1000
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    # Registers a user and returns the Authorization header for a fresh token
+    def login(name):
+        email = '%s@example.com' % name
+        client.post('/user/register', json={'username': name, 'email': email, 'password': 'secret'})
+        token = client.post('/user/login', json={'email': email, 'pwd': 'secret'}).json['access_token']
+        return {'Authorization': 'Bearer ' + token}
+    return login
+
+
+@pytest.fixture
+def add_book(client, login):
+    headers = login('admin')
+
+    def add_book(title, price, stock):
+        response = client.post('/books', headers=headers, json={'title': title, 'author': 'A', 'price': price, 'stock': stock})
+        return response.json['id']
+    return add_book
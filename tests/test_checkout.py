@@ -0,0 +1,82 @@
+import threading
+from extensions import db
+from models import Books, Cart, Order
+
+
+def run_concurrently(app, requests):
+    # Each (path, headers) pair is posted from its own thread, all released at once
+    barrier = threading.Barrier(len(requests))
+    responses = [None] * len(requests)
+
+    def post(index, path, headers):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post(path, headers=headers)
+        responses[index] = (response.status_code, response.json)
+
+    threads = [threading.Thread(target=post, args=(index,) + request) for index, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def test_checkout_places_order_and_empties_cart(client, login, add_book):
+    book_id = add_book('Dune', '10.50', 3)
+    headers = login('reader')
+    client.post('/cart', headers=headers, json={'book_id': book_id, 'quantity': 2})
+
+    response = client.post('/checkout', headers=headers)
+
+    assert response.status_code == 200
+    order = response.json['order']
+    assert order['total'].startswith('21.0')
+    assert [(item['book_id'], item['quantity']) for item in order['items']] == [(book_id, 2)]
+    assert client.get('/books/%d' % book_id).json['stock'] == 1
+    assert client.get('/cart', headers=headers).json['items'] == []
+
+
+def test_insufficient_stock_keeps_cart(client, login, add_book):
+    book_id = add_book('Dune', '10', 1)
+    headers = login('reader')
+    client.post('/cart', headers=headers, json={'book_id': book_id, 'quantity': 2})
+
+    response = client.post('/checkout', headers=headers)
+
+    assert response.status_code == 409
+    assert response.json['items'] == [{'book_id': book_id, 'requested': 2, 'available': 1}]
+    assert client.get('/books/%d' % book_id).json['stock'] == 1
+    assert [item['quantity'] for item in client.get('/cart', headers=headers).json['items']] == [2]
+
+
+def test_concurrent_checkouts_never_oversell(app, client, login, add_book):
+    scarce = add_book('Scarce', '10', 5)
+    plenty = add_book('Plenty', '2', 1000)
+    buyers = [login('buyer%d' % index) for index in range(8)]
+    for headers in buyers:
+        client.post('/cart', headers=headers, json={'book_id': scarce, 'quantity': 2})
+        client.post('/cart', headers=headers, json={'book_id': plenty, 'quantity': 3})
+
+    responses = run_concurrently(app, [('/checkout', headers) for headers in buyers])
+
+    assert sorted(status for status, _ in responses) == [200] * 2 + [409] * 6
+    with app.app_context():
+        assert db.session.get(Books, scarce).stock == 1
+        assert db.session.get(Books, plenty).stock == 1000 - 2 * 3
+        assert db.session.query(Order).count() == 2
+        # Every refused buyer still has both lines
+        assert db.session.query(Cart).count() == 6 * 2
+
+
+def test_concurrent_checkouts_of_one_cart_place_one_order(app, client, login, add_book):
+    book_id = add_book('Dune', '10', 100)
+    headers = login('reader')
+    client.post('/cart', headers=headers, json={'book_id': book_id, 'quantity': 4})
+
+    responses = run_concurrently(app, [('/checkout', headers)] * 4)
+
+    assert sorted(status for status, _ in responses) == [200, 400, 400, 400]
+    with app.app_context():
+        assert db.session.get(Books, book_id).stock == 96
+        assert db.session.query(Order).count() == 1
@@ -0,0 +1,92 @@
+import threading
+from datetime import datetime, timedelta
+from extensions import db
+from models import Cart, IdempotencyKey, Order
+
+
+def test_retry_replays_stored_response(app, client, login, add_book):
+    book_id = add_book('Dune', '10', 5)
+    headers = dict(login('reader'), **{'Idempotency-Key': 'add-1'})
+
+    first = client.post('/cart', headers=headers, json={'book_id': book_id, 'quantity': 2})
+    retry = client.post('/cart', headers=headers, json={'book_id': book_id, 'quantity': 2})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_data() == first.get_data()
+    assert 'Idempotent-Replayed' not in first.headers
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    with app.app_context():
+        assert db.session.scalar(db.select(Cart.quantity)) == 2
+
+
+def test_key_reused_for_different_body_is_rejected(client, login, add_book):
+    book_id = add_book('Dune', '10', 5)
+    headers = dict(login('reader'), **{'Idempotency-Key': 'add-1'})
+    client.post('/cart', headers=headers, json={'book_id': book_id, 'quantity': 1})
+
+    response = client.post('/cart', headers=headers, json={'book_id': book_id, 'quantity': 3})
+
+    assert response.status_code == 422
+
+
+def test_key_still_in_progress_is_refused(app, client, login, add_book):
+    book_id = add_book('Dune', '10', 5)
+    headers = dict(login('reader'), **{'Idempotency-Key': 'add-1'})
+    body = b'{"book_id": %d}' % book_id
+    first = client.post('/cart', headers=headers, data=body, content_type='application/json')
+    assert first.status_code == 201
+    # Turn the finished claim back into one whose request is still running
+    with app.app_context():
+        record = db.session.scalars(db.select(IdempotencyKey)).one()
+        record.status_code = None
+        record.body = None
+        db.session.commit()
+
+    response = client.post('/cart', headers=headers, data=body, content_type='application/json')
+    assert response.status_code == 409
+
+    # A claim older than IDEMPOTENCY_LOCK_TIMEOUT is abandoned and the request runs again
+    with app.app_context():
+        record = db.session.scalars(db.select(IdempotencyKey)).one()
+        record.created_at = datetime.now() - timedelta(seconds=app.config['IDEMPOTENCY_LOCK_TIMEOUT'] + 1)
+        db.session.commit()
+    response = client.post('/cart', headers=headers, data=body, content_type='application/json')
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+
+
+def test_concurrent_retries_run_the_view_once(app, client, login, add_book):
+    book_id = add_book('Dune', '10', 100)
+    headers = dict(login('reader'), **{'Idempotency-Key': 'checkout-1'})
+    client.post('/cart', headers=headers, json={'book_id': book_id, 'quantity': 1})
+    barrier = threading.Barrier(4)
+    responses = []
+
+    def checkout():
+        retry_client = app.test_client()
+        barrier.wait()
+        response = retry_client.post('/checkout', headers=headers)
+        responses.append((response.status_code, response.headers.get('Idempotent-Replayed')))
+
+    threads = [threading.Thread(target=checkout) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One request ran; the others either saw its claim (409) or its stored response
+    ran = [response for response in responses if response == (200, None)]
+    others = [response for response in responses if response != (200, None)]
+    assert len(ran) == 1
+    assert all(status == 409 or replayed == 'true' for status, replayed in others)
+    with app.app_context():
+        assert db.session.query(Order).count() == 1
+
+
+def test_keys_are_scoped_per_user(client, login, add_book):
+    book_id = add_book('Dune', '10', 5)
+    for name in ('alice', 'bob'):
+        headers = dict(login(name), **{'Idempotency-Key': 'same-key'})
+        response = client.post('/cart', headers=headers, json={'book_id': book_id})
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response.headers
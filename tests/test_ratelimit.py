@@ -0,0 +1,69 @@
+import types
+import pytest
+import ratelimit
+from ratelimit import SlidingWindows, window_wait
+
+LIMIT = 10
+WINDOW = 60
+
+
+@pytest.mark.parametrize('previous, current, elapsed, cost, expected', [
+    # Room left in the sliding window
+    (0, 0, 0.5, 5, 0),
+    (10, 0, 0.5, 5, 0),
+    # Costs more than the whole allowance: the longest wait there is
+    (0, 0, 0.5, 11, WINDOW),
+    # Only the previous window is in the way: wait until half of it has slid out
+    (10, 0, 0.25, 5, 15),
+    # This window is already too full: wait into the next one until 3/8 of it has passed
+    (0, 8, 0.5, 5, 52.5),
+])
+def test_window_wait(previous, current, elapsed, cost, expected):
+    assert window_wait(previous, current, elapsed, cost, LIMIT, WINDOW) == pytest.approx(expected)
+
+
+def test_request_fits_once_the_wait_is_over(monkeypatch):
+    now = [WINDOW * 1000 + 0.5 * WINDOW]
+    monkeypatch.setattr(ratelimit, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    windows = SlidingWindows()
+
+    assert windows.take('books', 'ip:1', 8, LIMIT, WINDOW) == 0
+    wait = windows.take('books', 'ip:1', 5, LIMIT, WINDOW)
+    assert wait == pytest.approx(52.5)
+    # A refused request spends nothing, and other clients have their own allowance
+    assert windows.take('books', 'ip:2', 5, LIMIT, WINDOW) == 0
+
+    now[0] += wait - 1
+    assert windows.take('books', 'ip:1', 5, LIMIT, WINDOW) > 0
+    now[0] += 1
+    assert windows.take('books', 'ip:1', 5, LIMIT, WINDOW) == 0
+
+
+def test_rate_limited_view_sends_retry_after(app, client, login, monkeypatch):
+    app.config['RATE_LIMIT'] = 10
+    reader = login('reader')
+    # Halfway through a window
+    monkeypatch.setattr(ratelimit, 'time', types.SimpleNamespace(time=lambda: 1000.5 * 60))
+    # GET /books costs 5, so the third request in a window is refused
+    assert client.get('/books').status_code == 200
+    assert client.get('/books').status_code == 200
+    response = client.get('/books')
+
+    # The rest of this window, then half of the next for the full one to slide out
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '60'
+
+    # Another address, and a signed-in user on the same address, are counted separately
+    assert client.get('/books', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+    assert client.get('/books', headers=reader).status_code == 200
+
+
+def test_retry_after_rounds_up(app, client, monkeypatch):
+    app.config['RATE_LIMIT'] = 10
+    monkeypatch.setattr(app.extensions['bookstore_rate_limiter'], 'take', lambda *args: 0.2)
+
+    response = client.get('/books')
+
+    assert response.status_code == 429
+    # A fraction of a second still tells the client to wait, not to retry at once
+    assert response.headers['Retry-After'] == '1'
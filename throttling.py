@@ -0,0 +1,27 @@
+from flask import current_app, jsonify, request
+from functools import wraps
+import math
+from auth import request_user_id
+from extensions import rate_limiter
+
+
+def rate_limited(cost):
+    # Every client has one allowance of RATE_LIMIT units per RATE_LIMIT_WINDOW seconds,
+    # shared by all the views wearing this decorator; each request spends the view's
+    # cost. Clients are told apart by their token's user id, or by address when anonymous.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limit = current_app.config['RATE_LIMIT']
+            if not limit:
+                return view(*args, **kwargs)
+            user_id = request_user_id()
+            client = 'user:%s' % user_id if user_id is not None else 'ip:%s' % request.remote_addr
+            wait = rate_limiter.take(request.endpoint, client, cost, limit, current_app.config['RATE_LIMIT_WINDOW'])
+            if wait:
+                response = jsonify({"msg": "Rate limit exceeded, try again later"})
+                response.headers['Retry-After'] = str(math.ceil(wait))
+                return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,125 @@
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, jwt_required
+from datetime import datetime
+import math
+from extensions import blocklist, db, login_limiter, password_hasher
+from models import user
+from passwords import HashingBusy
+
+bp = Blueprint('users', __name__)
+
+@bp.route('/user/register',methods=['POST'])
+def register():
+    data=request.get_json()
+    
+    #Scenario where no details are entered.
+    if not data:
+        return jsonify("No data is provided here"),400
+    
+    username=data.get('username')
+    email=data.get('email')
+    pwd=data.get('password')
+    
+    # Registering hashes a password too, so it draws from the same per-IP bucket as login
+    limited = login_rate_limited()
+    if limited:
+        return limited
+    
+    #scenario where any details are missing during registration
+    if username is None or email is None or pwd is None:
+        return jsonify("username, email or pwd is missing")
+    # Anything else would reach the hasher and fail there with a 500
+    if not isinstance(pwd, str):
+        return jsonify("password must be a string"),400
+    
+    #scenario where user already registered.
+    exist=user.query.filter_by(email=email).first()
+    if exist:
+        return jsonify("User is already registered"),400
+    
+    try:
+        new_user=user(username=username,email=email,pwd=password_hasher.hash(pwd))
+    except HashingBusy:
+        return hashing_busy()
+    
+    db.session.add(new_user)
+    db.session.commit()
+    return jsonify(new_user.todict()), 201
+    
+    
+@bp.route('/user/login', methods=['POST'])
+def login():
+    data=request.get_json()
+    
+    #Scenario where no details are entered
+    if not data:
+        return jsonify("No details are entered"),400
+    
+    email=data.get("email")
+    pwd=data.get("pwd")
+    
+    # Checked before the user lookup and the hash, so rejected attempts cost neither
+    limited = login_rate_limited(email)
+    if limited:
+        return limited
+    
+    #Scenario where one of the details is missing
+    if email is None or pwd is None:
+        return jsonify("email or password is missing")
+    if not isinstance(pwd, str):
+        return jsonify("password must be a string"),400
+    
+    x=user.query.filter_by(email=email).first()
+    try:
+        # Unknown emails are checked against a dummy hash so they take as long as a wrong password
+        valid, needs_rehash = password_hasher.verify(x.pwd if x else None, pwd)
+    except HashingBusy:
+        return hashing_busy()
+    
+    if valid and needs_rehash:
+        # Plaintext rows and hashes made with older cost settings are upgraded in place.
+        # When the pool is busy the upgrade waits for a later login; this one still succeeds.
+        try:
+            x.pwd = password_hasher.hash(pwd)
+            db.session.commit()
+        except HashingBusy:
+            pass
+    
+    if valid:
+        # The user id rides along as a claim so authenticated requests never look it up
+        access_token=create_access_token(identity={'email':email}, additional_claims={'uid': x.id})
+        return jsonify(access_token=access_token),200
+    return jsonify("Invalid credentials")
+
+@bp.route('/user/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    # Revokes the token this request was made with; it is refused from now until it expires
+    claims = get_jwt()
+    expires_at = datetime.fromtimestamp(claims['exp']) if 'exp' in claims else None
+    blocklist.revoke(claims['jti'], expires_at)
+    return jsonify({"msg": "Logged out"}), 200
+
+def login_rate_limited(email=None):
+    config = current_app.config
+    wait = login_limiter.take('login_ip', request.remote_addr, config['LOGIN_IP_BURST'], config['LOGIN_IP_PER_MINUTE'] / 60)
+    if not wait and isinstance(email, str):
+        wait = login_limiter.take(
+            'login_email', email.strip().lower(), config['LOGIN_EMAIL_BURST'], config['LOGIN_EMAIL_PER_MINUTE'] / 60)
+    if not wait:
+        return None
+    response = jsonify({"msg": "Too many login attempts, try again later"})
+    response.headers['Retry-After'] = str(math.ceil(wait))
+    return response, 429
+
+def hashing_busy():
+    response = jsonify({"msg": "Too many logins in progress, try again shortly"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@bp.route('/profile', methods=['GET'])
+@jwt_required()
+def profile():
+    # Access the identity of the current user with get_jwt_identity
+    current_user = get_jwt_identity()
+    return jsonify({"msg": f"Hello, {current_user['email']}!"}), 200